@@ -1,27 +1,138 @@
+import hashlib
+import mmap
 import os
-import tiktoken
+import shutil
+import stat
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import IO, Iterable, Iterator
 from xml.sax.saxutils import escape
 
+import tiktoken
+from tiktoken import Encoding
+
 # --- Configuration: Ignore rules ---
 IGNORE_DIRS = {".git", "__pycache__", ".vscode"}
 IGNORE_FILES_SUFFIX = {".pyc"}
+IGNORE_FILES_SUFFIX_TUPLE = tuple(IGNORE_FILES_SUFFIX)  # str.endswith checks a tuple in one call
 IGNORE_FILES_NAMES = {"repo-contents.xml", ".DS_Store"}  # Also ignore output file
 BINARY_FILE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".pdf", ".zip", ".tar", ".gz"}
+# Files larger than this are read through mmap.
+MMAP_THRESHOLD_BYTES = 1 << 20
+# Included files are read and tokenized this many at a time.
+LOAD_CHUNK_FILES = 64
+# File bodies are buffered in memory up to this size before spilling to disk.
+SPOOL_MAX_BYTES = 64 * 1024 * 1024
+# Below this size the listing shows a token upper bound rather than an estimate.
+TINY_FILE_BYTES = 64
+
+
+@dataclass(slots=True)
+class FileEntry:
+    """
+    A file selected for inclusion in the XML output.
+    """
+
+    path: str
+    char_count: int
+    token_count: int
+
+
+@dataclass(slots=True)
+class DirectoryListing:
+    """
+    The files (with sizes in bytes) and subdirectories of one scanned directory.
+    """
+
+    files: list[tuple[Path, int]]
+    dirs: list[Path]
+
+
+# Set this environment variable to estimate token counts from length instead of running tiktoken.
+FAST_TOKEN_ESTIMATE_ENV = "FAST_TOKEN_ESTIMATE"
+CHARS_PER_TOKEN_ESTIMATE = 3.5
+
+# Loaded lazily on first use; building an Encoding is expensive.
+_ENCODING: Encoding | None = None
+# Token counts keyed by content digest; see get_token_counts.
+_TOKEN_COUNT_CACHE: dict[bytes, int] = {}
 
 # --- Utility Functions ---
 
 
+def _get_encoding() -> Encoding:
+    """
+    Return the shared tiktoken encoding, loading it on first call.
+    """
+    global _ENCODING
+    if _ENCODING is None:
+        try:
+            # Use encoding suitable for your target model.
+            _ENCODING = tiktoken.encoding_for_model("gpt-3.5-turbo")
+        except Exception:
+            _ENCODING = tiktoken.get_encoding("gpt2")
+    return _ENCODING
+
+
+def _fast_token_estimate_enabled() -> bool:
+    """
+    Return whether FAST_TOKEN_ESTIMATE asks for length-based token estimates.
+    """
+    return os.environ.get(FAST_TOKEN_ESTIMATE_ENV, "").strip().lower() not in {"", "0", "false", "no"}
+
+
+def _content_key(text: str) -> bytes:
+    """
+    Return a short digest of text, so cached counts don't keep large strings alive.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
 def get_token_count(text: str) -> int:
     """
     Return the token count for a given text based on target model encoding.
     """
-    try:
-        # Use encoding suitable for your target model.
-        encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
-    except Exception:
-        encoding = tiktoken.get_encoding("gpt2")
-    return len(encoding.encode(text))
+    return get_token_counts([text])[0]
+
+
+def get_token_counts(texts: list[str]) -> list[int]:
+    """
+    Return token counts for many texts, tokenizing them in one parallel batch.
+
+    Counts are memoized by content digest, so repeated files (empty modules,
+    license headers, vendored copies) are only tokenized once. If the
+    FAST_TOKEN_ESTIMATE environment variable is set, tokenization is skipped and
+    counts are estimated from text length instead.
+    """
+    if _fast_token_estimate_enabled():
+        return [int(len(text) / CHARS_PER_TOKEN_ESTIMATE) for text in texts]
+
+    keys = [_content_key(text) for text in texts]
+    uncached: dict[bytes, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in _TOKEN_COUNT_CACHE:
+            uncached.setdefault(key, text)
+    if uncached:
+        token_ids = _get_encoding().encode_ordinary_batch(list(uncached.values()), num_threads=os.cpu_count() or 1)
+        for key, ids in zip(uncached, token_ids):
+            _TOKEN_COUNT_CACHE[key] = len(ids)
+    return [_TOKEN_COUNT_CACHE[key] for key in keys]
+
+
+def format_token_estimate(num_bytes: int) -> str:
+    """
+    Describe a file's likely token count from its size alone, without reading it.
+
+    Byte-level BPE never yields more tokens than bytes, so tiny files get that
+    exact upper bound; larger files use the usual ~4 bytes per token.
+    """
+    if num_bytes < TINY_FILE_BYTES:
+        return f"<={num_bytes} tokens"
+    return f"~{num_bytes // 4} tokens"
 
 
 def format_size(num_bytes: int) -> str:
@@ -45,161 +156,293 @@ def prompt_choice(prompt: str, valid_choices: set[str]) -> str:
         print(f"Invalid choice. Please enter one of {', '.join(valid_choices)}.")
 
 
-def is_probably_binary(file_path: Path) -> bool:
+def _decode_if_text(data: bytes | mmap.mmap) -> str | None:
     """
-    Check if a file is likely binary based on extension or content.
+    Decode file bytes as UTF-8, or return None if they look binary.
     """
-    # Check file extension
-    ext = file_path.suffix.lower()
-    if ext in BINARY_FILE_EXTENSIONS:
-        return True
-
-    # Try to read a small chunk to detect binary content
+    if data.find(b"\0", 0, 8192) != -1:  # Null bytes usually indicate binary
+        return None
     try:
-        with file_path.open("rb") as f:
-            chunk = f.read(1024)
-            return b"\0" in chunk  # Null bytes usually indicate binary
-    except Exception:
-        return True  # If we can't read it, treat as binary to be safe
+        return str(data, "utf-8")
+    except UnicodeDecodeError:
+        return None
 
-    return False
 
+def _read_if_text(file_path: Path) -> str | None:
+    """
+    Read a file as UTF-8 text, or return None if it looks binary.
 
-# --- Core Interactive Function ---
+    The extension is checked first so known binary files cost no I/O; otherwise
+    the file is opened once and sniffed for null bytes before decoding.
+    """
+    if file_path.suffix.lower() in BINARY_FILE_EXTENSIONS:
+        return None
+
+    with file_path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size > MMAP_THRESHOLD_BYTES:
+            # Decode straight from a read-only mapping instead of copying the file into a bytes object first.
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                text = _decode_if_text(data)
+        else:
+            text = _decode_if_text(f.read())
+    if text is None:
+        return None
+    # Match text-mode reads, which translate universal newlines.
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _enumerate_tree(root: Path) -> dict[Path, DirectoryListing]:
+    """
+    Walk the whole tree once, before any prompts, honoring the ignore rules.
 
+    Every non-ignored subtree is scanned up front, including ones the user may
+    go on to decline (vendored code, virtualenvs), though files are only stat'ed
+    here, never read. Symlinked files and directories are followed only if they
+    resolve inside root, dangling symlinks are skipped quietly, and a directory
+    that would re-enter one of its own ancestors (a symlink loop) is skipped.
 
-def process_directory(
-    directory: Path, relative_path: Path = Path(""), included_files: list[dict] | None = None
-) -> list[dict]:
+    Returns the files (with sizes) and subdirectories of every directory found,
+    sorted by name.
     """
-    Recursively process a directory:
-      - List files (with details) and prompt: Yes (y), No (n), or One-by-one (o).
-      - Then lists subdirectories and prompts similarly.
+    tree: dict[Path, DirectoryListing] = {}
 
-    Returns: List of included file information
-    """
-    if included_files is None:
-        included_files = []
+    def on_error(e: OSError) -> None:
+        print(f"Error reading directory {e.filename}: {e}")
 
     try:
-        entries = sorted(
-            p for p in directory.iterdir() if not (p.is_dir() and p.name in IGNORE_DIRS or p.name.startswith("."))
-        )
-    except Exception as e:
-        print(f"Error reading directory {directory}: {e}")
-        return included_files
-
-    files = []
-    dirs = []
-    for entry in entries:
-        if entry.is_dir():
-            if entry.name in IGNORE_DIRS or entry.name.startswith("."):
+        root_stat = os.stat(root)
+    except OSError as e:
+        on_error(e)
+        return tree
+    real_root = os.path.realpath(root)
+    # (st_dev, st_ino) of each pending directory and its ancestors, for loop detection.
+    ancestor_ids: dict[str, frozenset[tuple[int, int]]] = {
+        os.fspath(root): frozenset({(root_stat.st_dev, root_stat.st_ino)})
+    }
+
+    for dirpath, dirnames, filenames in os.walk(root, onerror=on_error, followlinks=True):
+        ids = ancestor_ids.pop(dirpath, frozenset())
+
+        # Prune in place so os.walk never descends into ignored, external or looping directories.
+        kept_dirs = []
+        for name in sorted(dirnames):
+            if name in IGNORE_DIRS or name.startswith("."):
+                continue
+            child = os.path.join(dirpath, name)
+            try:
+                if os.path.islink(child):
+                    real_child = os.path.realpath(child)
+                    if os.path.commonpath([real_child, real_root]) != real_root:
+                        print(f"Skipping symlink {child}: points outside {root}")
+                        continue
+                child_stat = os.stat(child)
+            except (OSError, ValueError) as e:
+                print(f"Error reading directory {child}: {e}")
+                continue
+            child_id = (child_stat.st_dev, child_stat.st_ino)
+            if child_id in ids:
+                print(f"Skipping symlink loop at {child}")
                 continue
-            dirs.append(entry)
-        elif entry.is_file():
+            ancestor_ids[child] = ids | {child_id}
+            kept_dirs.append(name)
+        dirnames[:] = kept_dirs
+
+        directory = Path(dirpath)
+        files = []
+        for name in sorted(filenames):
             if (
-                entry.name in IGNORE_FILES_NAMES
-                or any(entry.name.endswith(suffix) for suffix in IGNORE_FILES_SUFFIX)
-                or entry.name.startswith(".")
+                name in IGNORE_FILES_NAMES
+                or name.endswith(IGNORE_FILES_SUFFIX_TUPLE)
+                or name.startswith(".")
             ):
                 continue
-            files.append(entry)
-
-    # --- Process Files ---
-    if files:
-        rel_path_str = str(relative_path) or "."
-        print(f"\nFiles in '{rel_path_str}':")
-        file_info_list = []
-        for file_path in files:
-            size_str = ""  # Initialize to handle potential missing assignment
+            file_path = directory / name
             try:
-                size_bytes = file_path.stat().st_size
-                size_str = format_size(size_bytes)
+                file_stat = file_path.lstat()
+                if stat.S_ISLNK(file_stat.st_mode):
+                    if os.path.commonpath([os.path.realpath(file_path), real_root]) != real_root:
+                        print(f"Skipping symlink {file_path}: points outside {root}")
+                        continue
+                    file_stat = file_path.stat()
+            except FileNotFoundError:
+                continue  # Dangling symlink
+            except Exception as e:
+                print(f"Error reading file {file_path}: {e}")
+                continue
+            if stat.S_ISREG(file_stat.st_mode):
+                files.append((file_path, file_stat.st_size))
+        tree[directory] = DirectoryListing(files=files, dirs=[directory / name for name in dirnames])
+    return tree
+
+
+def _iter_included_files(selected_files: list[tuple[Path, str]]) -> Iterator[tuple[FileEntry, str]]:
+    """
+    Read and tokenize the files the user chose to include, yielding each with its content.
 
-                # Check if file is binary
-                if is_probably_binary(file_path):
-                    print(f"  - {file_path.name}: {size_str} (binary file, will be skipped)")
+    Takes (path, forward-slash path relative to the start directory) pairs.
+    Files are read concurrently (reads release the GIL) and tokenized in
+    batches of LOAD_CHUNK_FILES, so only one batch of contents is held at a
+    time. Binary, non-UTF-8 and empty files are reported and dropped.
+    """
+    if not selected_files:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(32, len(selected_files))) as executor:
+        for start in range(0, len(selected_files), LOAD_CHUNK_FILES):
+            chunk = selected_files[start : start + LOAD_CHUNK_FILES]
+            futures = [executor.submit(_read_if_text, file_path) for file_path, _ in chunk]
+
+            loaded_files = []
+            for (file_path, file_rel_path), future in zip(chunk, futures):
+                try:
+                    content = future.result()
+                except Exception as e:
+                    print(f"Error reading file {file_path}: {e}")
+                    continue
+                if content is None:
+                    print(f"Skipping '{file_rel_path}': binary or non-UTF-8 file")
+                    continue
+                if not content:  # Skip empty files
                     continue
+                loaded_files.append((file_rel_path, content))
 
-                with file_path.open("r", encoding="utf-8") as f:
-                    content = f.read()
-                char_count = len(content)
-                token_count = get_token_count(content)
-            except UnicodeDecodeError:
-                print(f"  - {file_path.name}: {size_str} (binary or non-UTF-8 file, will be skipped)")
-                continue
-            except Exception as e:
-                print(f"Error reading file {file_path}: {e}")
+            token_counts = get_token_counts([content for _, content in loaded_files])
+            for (file_rel_path, content), token_count in zip(loaded_files, token_counts):
+                file_entry = FileEntry(path=file_rel_path, char_count=len(content), token_count=token_count)
+                yield file_entry, content
+
+
+# --- Core Interactive Function ---
+
+
+def _select_from_directory(
+    directory: Path,
+    relative_path: Path,
+    tree: dict[Path, DirectoryListing],
+    selected_files: list[tuple[Path, str]],
+    stack: deque[tuple[bool, Path, Path]],
+) -> None:
+    """
+    Prompt for one scanned directory:
+      - List files (with details) and prompt: Yes (y), No (n), or One-by-one (o).
+      - Then lists subdirectories and prompts similarly.
+
+    Chosen files are appended to selected_files as (path, relative path string) pairs.
+    Chosen subdirectories are pushed onto stack as (ask first, path, relative path),
+    where ask first defers the one-by-one prompt until the entry is popped.
+    """
+    listing = tree.get(directory)
+    if listing is None:  # Unreadable, already reported during the scan
+        return
+
+    # --- Process Files ---
+    if listing.files:
+        rel_path_str = str(relative_path) or "."
+        # Only sizes are known here; contents are read once the user has chosen.
+        # The listing is built up and written in one go rather than line by line.
+        lines = [f"\nFiles in '{rel_path_str}':"]
+        # Forward-slash relative paths, computed once per file.
+        rel_prefix = relative_path.as_posix() + "/" if relative_path.parts else ""
+        file_info_list = []
+        for file_path, size_bytes in listing.files:
+            size_str = format_size(size_bytes)
+            if file_path.suffix.lower() in BINARY_FILE_EXTENSIONS:
+                lines.append(f"  - {file_path.name}: {size_str} (binary file, will be skipped)")
                 continue
-            print(f"  - {file_path.name}: {size_str}, {char_count} chars, ~{token_count} tokens")
-            file_info_list.append((file_path, content, char_count, token_count, size_str))
+            token_estimate = format_token_estimate(size_bytes)
+            lines.append(f"  - {file_path.name}: {size_str}, {token_estimate}")
+            file_info_list.append((file_path, rel_prefix + file_path.name, size_bytes, token_estimate, size_str))
+        sys.stdout.write("\n".join(lines) + "\n")
 
         file_choice = prompt_choice(
             f"Include files in '{rel_path_str}'? (Y=all, N=none, O=one-by-one): ", {"y", "n", "o"}
         )
         if file_choice == "y":
-            for file_path, content, char_count, token_count, _ in file_info_list:
-                if char_count == 0:  # Skip empty files
+            for file_path, file_rel_path, size_bytes, _, _ in file_info_list:
+                if size_bytes == 0:  # Skip empty files
                     continue
-                file_rel_path = relative_path / file_path.name if relative_path else Path(file_path.name)
-                included_files.append(
-                    {
-                        "path": str(file_rel_path).replace(os.sep, "/"),
-                        "content": content,
-                        "char_count": char_count,
-                        "token_count": token_count,
-                    }
-                )
+                selected_files.append((file_path, file_rel_path))
         elif file_choice == "o":
-            for file_path, content, char_count, token_count, size_str in file_info_list:
-                prompt_file = (
-                    f"Include '{file_path.name}' ({size_str}, {char_count} chars, ~{token_count} tokens)? (y/n): "
-                )
+            for file_path, file_rel_path, size_bytes, token_estimate, size_str in file_info_list:
+                prompt_file = f"Include '{file_path.name}' ({size_str}, {token_estimate})? (y/n): "
                 sub_choice = prompt_choice(prompt_file, {"y", "n"})
                 if sub_choice == "y":
-                    if char_count == 0:
+                    if size_bytes == 0:
                         continue
-                    file_rel_path = relative_path / file_path.name if relative_path else Path(file_path.name)
-                    included_files.append(
-                        {
-                            "path": str(file_rel_path).replace(os.sep, "/"),
-                            "content": content,
-                            "char_count": char_count,
-                            "token_count": token_count,
-                        }
-                    )
+                    selected_files.append((file_path, file_rel_path))
         # 'n' leads to skipping files
 
     # --- Process Directories ---
+    dirs = listing.dirs
     if dirs:
         rel_path_str = str(relative_path) or "."
-        print(f"\nDirectories in '{rel_path_str}':")
-        for dir_path in dirs:
-            print(f"  - {dir_path.name}")
+        lines = [f"\nDirectories in '{rel_path_str}':"]
+        lines.extend(f"  - {dir_path.name}" for dir_path in dirs)
+        sys.stdout.write("\n".join(lines) + "\n")
         dir_choice = prompt_choice(
             f"Include directories in '{rel_path_str}'? (Y=all, N=none, O=one-by-one): ", {"y", "n", "o"}
         )
-        if dir_choice == "y":
-            for dir_path in dirs:
+        # Pushed in reverse so they pop in listing order, each subtree finishing before
+        # the next sibling is prompted for, just as a recursive walk would.
+        if dir_choice in {"y", "o"}:
+            ask_first = dir_choice == "o"
+            for dir_path in reversed(dirs):
                 new_rel_path = relative_path / dir_path.name if relative_path else Path(dir_path.name)
-                process_directory(dir_path, new_rel_path, included_files)
-        elif dir_choice == "o":
-            for dir_path in dirs:
-                sub_choice = prompt_choice(f"Include directory '{dir_path.name}'? (y/n): ", {"y", "n"})
-                if sub_choice == "y":
-                    new_rel_path = relative_path / dir_path.name if relative_path else Path(dir_path.name)
-                    process_directory(dir_path, new_rel_path, included_files)
+                stack.append((ask_first, dir_path, new_rel_path))
         # 'n' leads to skipping directories
 
-    return included_files
+
+def process_directory(directory: Path) -> list[tuple[Path, str]]:
+    """
+    Interactively choose files under a directory:
+      - Scan the whole tree up front.
+      - Prompt directory by directory for files, then subdirectories.
+
+    Returns: List of chosen (path, relative path string) pairs
+    """
+    tree = _enumerate_tree(directory)
+    selected_files: list[tuple[Path, str]] = []
+    # An explicit stack rather than recursion, so deep trees can't hit the recursion limit.
+    stack: deque[tuple[bool, Path, Path]] = deque([(False, directory, Path(""))])
+    while stack:
+        ask_first, dir_path, relative_path = stack.pop()
+        if ask_first:
+            sub_choice = prompt_choice(f"Include directory '{dir_path.name}'? (y/n): ", {"y", "n"})
+            if sub_choice != "y":
+                continue
+        _select_from_directory(dir_path, relative_path, tree, selected_files, stack)
+    return selected_files
 
 
 # --- XML Generation ---
 
 
-def generate_xml(included_files: list[dict], repo_name: str | None = None) -> str:
+def write_file_bodies(files: Iterable[tuple[FileEntry, str]], fp: IO[str]) -> list[FileEntry]:
     """
-    Generate an XML representation of the selected files.
+    Write the <file> element for each (entry, content) pair to fp as it arrives.
+
+    Contents can be dropped as soon as they are written. Returns the entries, for
+    the directory index and summary.
+    """
+    included_files = []
+    # Content goes in CDATA sections, so it needs no escaping. A literal "]]>"
+    # (rare in source) is split across two sections.
+    for file_entry, content in files:
+        escaped_path = escape(file_entry.path)
+        fp.write(f'  <file path="{escaped_path}">\n')
+        fp.write("    <![CDATA[")
+        fp.write(content.replace("]]>", "]]]]><![CDATA[>"))
+        fp.write("]]>\n  </file>\n\n")
+        included_files.append(file_entry)
+    return included_files
+
+
+def write_xml(included_files: list[FileEntry], file_bodies: IO[str], fp: IO[str], repo_name: str | None = None) -> None:
+    """
+    Stream the XML document to an open text file: the repo header and directory
+    index, then the <file> elements already written to file_bodies.
     """
     # Use the current directory's name as the repository name if not provided
     if repo_name is None:
@@ -208,25 +451,17 @@ def generate_xml(included_files: list[dict], repo_name: str | None = None) -> st
     # Escape XML special characters in the repo name
     repo_name = escape(repo_name)
 
-    xml_lines = []
-    xml_lines.append(f'<repo name="{repo_name}">')
+    fp.write(f'<repo name="{repo_name}">\n')
 
     # Index: directory structure with included file paths.
-    xml_lines.append("  <directory structure>")
-    for file_info in included_files:
-        xml_lines.append(f"    /{file_info['path']}")
-    xml_lines.append("  </directory>\n")
+    fp.write("  <directory structure>\n")
+    for file_entry in included_files:
+        fp.write(f"    /{file_entry.path}\n")
+    fp.write("  </directory>\n\n")
 
-    # File entries with XML-escaped content.
-    for file_info in included_files:
-        escaped_path = escape(file_info["path"])
-        escaped_content = escape(file_info["content"])
-        xml_lines.append(f'  <file path="{escaped_path}">')
-        xml_lines.append(f"    {escaped_content}")
-        xml_lines.append("  </file>\n")
-    xml_lines.append("</repo>")
-
-    return "\n".join(xml_lines)
+    file_bodies.seek(0)
+    shutil.copyfileobj(file_bodies, fp, 1 << 20)
+    fp.write("</repo>")
 
 
 # --- CLI Entry Point ---
@@ -245,29 +480,34 @@ def main(output_file: str = "repo-contents.xml", start_dir: str | None = None) -
 
     # Begin processing at the specified directory or current working directory
     start_directory = Path(start_dir) if start_dir else Path.cwd()
-    included_files = process_directory(start_directory)
-
-    # Show summary totals.
-    total_chars = sum(f["char_count"] for f in included_files)
-    total_tokens = sum(f["token_count"] for f in included_files)
-    print("\nSummary:")
-    print(f"  Total included files: {len(included_files)}")
-    print(f"  Total characters: {total_chars}")
-    print(f"  Total tokens: {total_tokens}")
-
-    # Generate and write XML output.
-    xml_content = generate_xml(included_files)
-    try:
-        # Create output path
-        output_path = Path(output_file)
-        if not output_path.is_absolute():
-            output_path = start_directory / output_path
-
-        with output_path.open("w", encoding="utf-8") as f:
-            f.write(xml_content)
-        print(f"\nXML output written to '{output_path}'.")
-    except Exception as e:
-        print(f"Error writing XML file: {e}")
+    selected_files = process_directory(start_directory)
+
+    # Read, count and write each file's body in one pass, spooling the bodies so the
+    # directory index can still come first in the output.
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+", encoding="utf-8") as file_bodies:
+        included_files = write_file_bodies(_iter_included_files(selected_files), file_bodies)
+
+        # Show summary totals.
+        total_chars = sum(f.char_count for f in included_files)
+        total_tokens = sum(f.token_count for f in included_files)
+        print("\nSummary:")
+        print(f"  Total included files: {len(included_files)}")
+        print(f"  Total characters: {total_chars}")
+        estimate_note = " (estimated from length)" if _fast_token_estimate_enabled() else ""
+        print(f"  Total tokens: {total_tokens}{estimate_note}")
+
+        # Stream XML output straight to the file.
+        try:
+            # Create output path
+            output_path = Path(output_file)
+            if not output_path.is_absolute():
+                output_path = start_directory / output_path
+
+            with output_path.open("w", encoding="utf-8", buffering=1 << 20) as f:
+                write_xml(included_files, file_bodies, f)
+            print(f"\nXML output written to '{output_path}'.")
+        except Exception as e:
+            print(f"Error writing XML file: {e}")
 
 
 if __name__ == "__main__":
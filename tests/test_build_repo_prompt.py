@@ -1,9 +1,12 @@
+import io
 from pathlib import Path
+from xml.etree import ElementTree
 
 import pytest
 
 # Import the main function and reset any global state for testing
-from global_scripts.build_repo_prompt import main
+from global_scripts import build_repo_prompt
+from global_scripts.build_repo_prompt import FileEntry, main, write_file_bodies, write_xml
 
 @pytest.fixture
 def complex_temp_repo(tmp_path, monkeypatch):
@@ -138,4 +141,216 @@ def test_complex_repo_selection(monkeypatch, complex_temp_repo):
 
     # Clean up test file
     if output_file.exists():
-        output_file.unlink()
\ No newline at end of file
+        output_file.unlink()
+
+def test_write_xml_wraps_content_in_cdata():
+    """
+    File contents are emitted verbatim inside CDATA, with any "]]>" split so
+    the section cannot end early.
+    """
+    content = "if a < b && c]]>d:"
+    file_bodies = io.StringIO()
+    included_files = write_file_bodies([(FileEntry(path="a.py", char_count=18, token_count=5), content)], file_bodies)
+    buffer = io.StringIO()
+    write_xml(included_files, file_bodies, buffer, repo_name="repo")
+
+    xml_content = buffer.getvalue()
+    assert "<![CDATA[if a < b && c]]]]><![CDATA[>d:]]>" in xml_content
+    # The split sections still parse back to the original text.
+    root = ElementTree.fromstring(xml_content.replace("<directory structure>", "<directory>"))
+    assert (root.findtext("file") or "").strip() == "if a < b && c]]>d:"
+
+
+def test_fast_token_estimate_skips_tokenizer(monkeypatch):
+    """
+    With FAST_TOKEN_ESTIMATE set, token counts come from text length and the
+    tiktoken encoding is never loaded.
+    """
+
+    def fail_to_load():
+        raise AssertionError("encoding should not be loaded")
+
+    monkeypatch.setenv("FAST_TOKEN_ESTIMATE", "1")
+    monkeypatch.setattr(build_repo_prompt, "_get_encoding", fail_to_load)
+
+    assert build_repo_prompt.get_token_counts(["a" * 35, ""]) == [10, 0]
+    assert build_repo_prompt.get_token_count("a" * 7) == 2
+
+
+def test_scan_handles_symlink_alias_loop_and_escape(tmp_path, monkeypatch, capsys):
+    """
+    A symlink aliasing a real directory must not hide that directory, a symlink
+    back to an ancestor is skipped as a loop, symlinks (file or directory)
+    pointing outside the start directory are not followed, and dangling
+    symlinks are skipped without an error. File symlinks inside it are kept.
+    """
+    repo = tmp_path / "repo"
+    real_dir = repo / "zreal"
+    real_dir.mkdir(parents=True)
+    (real_dir / "f.txt").write_text("real content")
+    (real_dir / "loop").symlink_to(repo, target_is_directory=True)
+    (repo / "alink").symlink_to(real_dir, target_is_directory=True)
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    (elsewhere / "secret.txt").write_text("outside the repo")
+    (repo / "outside").symlink_to(elsewhere, target_is_directory=True)
+    (repo / "outside.txt").symlink_to(elsewhere / "secret.txt")
+    (repo / "broken.txt").symlink_to(repo / "missing.txt")
+    (repo / "inside.txt").symlink_to(real_dir / "f.txt")
+
+    tree = build_repo_prompt._enumerate_tree(repo)
+    assert tree[repo].dirs == [repo / "alink", repo / "zreal"]
+    assert [path.name for path, _ in tree[repo].files] == ["inside.txt"]
+    assert "broken.txt" not in capsys.readouterr().out
+    assert [path.name for path, _ in tree[real_dir].files] == ["f.txt"]
+    assert tree[real_dir].dirs == []
+    assert tree[repo / "alink"].dirs == []
+
+    # Skip top-level files, then directories one-by-one: skip alink, take zreal and its files.
+    responses = iter(["n", "o", "n", "y", "y"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(responses))
+    assert build_repo_prompt.process_directory(repo) == [(real_dir / "f.txt", "zreal/f.txt")]
+
+
+def test_read_if_text_large_files_use_mmap(tmp_path, monkeypatch):
+    """
+    Files over MMAP_THRESHOLD_BYTES are read through mmap and still decode, sniff
+    and translate newlines exactly like a text-mode read.
+    """
+    real_mmap = build_repo_prompt.mmap.mmap
+    mapped = []
+
+    def spy_mmap(*args, **kwargs):
+        mapped.append(args)
+        return real_mmap(*args, **kwargs)
+
+    monkeypatch.setattr(build_repo_prompt.mmap, "mmap", spy_mmap)
+
+    line = "naïve café ✓\r\n".encode("utf-8")
+    repeats = build_repo_prompt.MMAP_THRESHOLD_BYTES // len(line) + 1
+    text_file = tmp_path / "large.txt"
+    text_file.write_bytes(line * repeats + b"last\rline")
+    assert text_file.stat().st_size > build_repo_prompt.MMAP_THRESHOLD_BYTES
+    assert build_repo_prompt._read_if_text(text_file) == text_file.read_text(encoding="utf-8")
+
+    binary_file = tmp_path / "large.txt.bin"
+    binary_file.write_bytes(b"\0" + b"a" * build_repo_prompt.MMAP_THRESHOLD_BYTES)
+    assert build_repo_prompt._read_if_text(binary_file) is None
+
+    non_utf8_file = tmp_path / "large-latin1.txt"
+    non_utf8_file.write_bytes(b"caf\xe9 " * (build_repo_prompt.MMAP_THRESHOLD_BYTES // 5 + 1))
+    assert build_repo_prompt._read_if_text(non_utf8_file) is None
+
+    assert len(mapped) == 3
+
+
+def test_token_counts_are_memoized_by_content(monkeypatch):
+    """
+    Identical texts are tokenized once per batch, and texts seen before are not
+    tokenized again.
+    """
+    batches = []
+
+    class StubEncoding:
+        def encode_ordinary_batch(self, texts, num_threads=1):
+            batches.append(list(texts))
+            return [text.split() for text in texts]
+
+    monkeypatch.delenv("FAST_TOKEN_ESTIMATE", raising=False)
+    monkeypatch.setattr(build_repo_prompt, "_TOKEN_COUNT_CACHE", {})
+    monkeypatch.setattr(build_repo_prompt, "_get_encoding", StubEncoding)
+
+    texts = ["same words here", "same words here", "different"]
+    assert build_repo_prompt.get_token_counts(texts) == [3, 3, 1]
+    assert batches == [["same words here", "different"]]
+
+    assert build_repo_prompt.get_token_counts(texts) == [3, 3, 1]
+    assert len(batches) == 1
+
+
+def test_one_by_one_directory_prompts_follow_depth_first_order(tmp_path, monkeypatch):
+    """
+    In one-by-one mode each subdirectory is prompted for only after the previous
+    sibling's whole subtree has been handled, as the old recursive walk did.
+    """
+    for directory in ["a/a1/a1x", "a/a2", "b", "c"]:
+        (tmp_path / directory).mkdir(parents=True, exist_ok=True)
+    for directory in [".", "a", "a/a1", "a/a1/a1x", "a/a2", "b", "c"]:
+        (tmp_path / directory / "f.txt").write_text("x")
+
+    prompts = []
+
+    def answer(prompt):
+        prompts.append(prompt)
+        if prompt.startswith("Include files in"):
+            return "n"
+        if prompt.startswith("Include directories in"):
+            return "o"
+        return "n" if prompt.startswith("Include directory 'b'") else "y"
+
+    monkeypatch.setattr("builtins.input", answer)
+    assert build_repo_prompt.process_directory(tmp_path) == []
+
+    all_or_one = "? (Y=all, N=none, O=one-by-one): "
+    assert prompts == [
+        f"Include files in '.'{all_or_one}",
+        f"Include directories in '.'{all_or_one}",
+        "Include directory 'a'? (y/n): ",
+        f"Include files in 'a'{all_or_one}",
+        f"Include directories in 'a'{all_or_one}",
+        "Include directory 'a1'? (y/n): ",
+        f"Include files in 'a/a1'{all_or_one}",
+        f"Include directories in 'a/a1'{all_or_one}",
+        "Include directory 'a1x'? (y/n): ",
+        f"Include files in 'a/a1/a1x'{all_or_one}",
+        "Include directory 'a2'? (y/n): ",
+        f"Include files in 'a/a2'{all_or_one}",
+        "Include directory 'b'? (y/n): ",
+        "Include directory 'c'? (y/n): ",
+        f"Include files in 'c'{all_or_one}",
+    ]
+
+
+def test_excluded_files_are_never_read_or_tokenized(tmp_path, monkeypatch):
+    """
+    Listing and prompting only stat files; contents are read and tokenized
+    solely for the files the user included.
+    """
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        (tmp_path / name).write_text(f"contents of {name}")
+
+    read_paths = []
+    tokenized = []
+
+    def fake_read(file_path):
+        read_paths.append(file_path)
+        return f"contents of {file_path.name}"
+
+    def fake_counts(texts):
+        tokenized.extend(texts)
+        return [1 for _ in texts]
+
+    monkeypatch.setattr(build_repo_prompt, "_read_if_text", fake_read)
+    monkeypatch.setattr(build_repo_prompt, "get_token_counts", fake_counts)
+    responses = iter(["o", "y", "n", "y"])  # one-by-one: include a.txt and c.txt only
+    monkeypatch.setattr("builtins.input", lambda prompt: next(responses))
+
+    selected_files = build_repo_prompt.process_directory(tmp_path)
+    assert read_paths == []
+    assert tokenized == []
+
+    included = list(build_repo_prompt._iter_included_files(selected_files))
+    assert [entry.path for entry, _ in included] == ["a.txt", "c.txt"]
+    assert read_paths == [tmp_path / "a.txt", tmp_path / "c.txt"]
+    assert tokenized == ["contents of a.txt", "contents of c.txt"]
+
+
+def test_format_token_estimate_switches_at_tiny_file_size():
+    """
+    Files below TINY_FILE_BYTES show a byte-count upper bound; larger files show
+    the ~4 bytes per token estimate.
+    """
+    assert build_repo_prompt.TINY_FILE_BYTES == 64
+    assert build_repo_prompt.format_token_estimate(0) == "<=0 tokens"
+    assert build_repo_prompt.format_token_estimate(63) == "<=63 tokens"
+    assert build_repo_prompt.format_token_estimate(64) == "~16 tokens"